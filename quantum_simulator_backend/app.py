@@ -1,22 +1,49 @@
 import os
-from flask import Flask, request, jsonify
+import re
+import atexit
+import base64
+import contextlib
+import functools
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 import numpy as np # For statevector calculations
+import orjson # Rust JSON encoder for the large statevector/probability responses
 
 # Ensure qiskit and qiskit_aer are importable
 try:
-    from qiskit import QuantumCircuit, transpile
+    from qiskit import transpile
+    from qiskit.circuit import ParameterVector
+    from qiskit.circuit.library import get_standard_gate_name_mapping
+    from qiskit.quantum_info import Clifford
     import qiskit  # For qiskit.circuit.ClassicalRegister, qiskit.circuit.Clbit
     from qiskit_aer import AerSimulator
-    from qiskit.quantum_info import Statevector # For statevector analysis
+    from qiskit.qasm2 import (loads as qasm_loads, LEGACY_CUSTOM_INSTRUCTIONS, LEGACY_CUSTOM_CLASSICAL, LEGACY_INCLUDE_PATH,
+                              QASM2ParseError)
 except ImportError as e:
     print(f"CRITICAL ERROR: Qiskit or Qiskit Aer is not installed correctly: {e}")
     print(
         "Please ensure you have a working Python environment (e.g., 3.11 or 3.12) where 'pip install qiskit qiskit-aer' succeeds fully.")
     raise
 
-from qiskit_ibm_runtime import QiskitRuntimeService, Options
+from qiskit_ibm_runtime import QiskitRuntimeService, Session, SamplerV2 as Sampler
+
+try:
+    import pyzx # Optional: enables the semantic (ZX-calculus) counts cache
+except ImportError:
+    pyzx = None
+
+try:
+    import redis # Optional: shared task queue/result store for async /simulate (see worker.py)
+except ImportError:
+    redis = None
 
 load_dotenv()
 
@@ -81,90 +108,648 @@ else:
     print("IBM_QUANTUM_API_KEY not found. Will use local Aer simulator if possible.")
 
 
-@app.route('/simulate', methods=['POST'])
-def simulate_circuit_for_counts(): # Renamed for clarity
-    data = request.get_json()
-    if not data or 'qasm' not in data:
-        return jsonify({"error": "Missing 'qasm' in request body"}), 400
+# --- IBM backend lookups are network round-trips; reuse them for a while ---
+IBM_BACKEND_TTL = 300 # seconds
+IBM_BACKEND_CACHE_SIZE = 32
+IBM_SIM_LIST_TTL = 60
+ibm_backend_cache = {} # name -> (backend, fetched_at)
+ibm_sim_backends_cache = None # (backends, fetched_at)
 
-    qasm_code = data['qasm']
-    shots = data.get('shots', 1024)
-    requested_ibm_backend_name = data.get('backend', 'ibmq_qasm_simulator')
 
+def _get_ibm_backend(name):
+    """Backend for name, or the first available IBM simulator if name can't be found (e.g. a retired backend).
+
+    The fallback is cached under the requested name too, so a missing default backend costs one failed lookup per TTL
+    instead of one per request.
+    """
+    entry = ibm_backend_cache.get(name)
+    if entry and time.monotonic() - entry[1] < IBM_BACKEND_TTL:
+        return entry[0]
     try:
-        circuit = QuantumCircuit.from_qasm_str(qasm_code)
-        print(f"Counts Sim: Circuit from QASM. Qubits: {circuit.num_qubits}, Classical Bits: {circuit.num_clbits}")
-    except Exception as qasm_err:
-        return jsonify({"error": f"Invalid QASM input: {qasm_err}"}), 400
+        backend = service.backend(name=name, instance=INSTANCE_FROM_ENV if INSTANCE_FROM_ENV else None)
+    except Exception as lookup_err:
+        sims = _get_ibm_sim_backends()
+        if not sims: raise ValueError("No IBM simulators available now.")
+        backend = sims[0]
+        print(f"IBM backend '{name}' unavailable ({lookup_err}); using {backend.name} for the next {IBM_BACKEND_TTL}s.")
+    ibm_backend_cache.pop(name, None)
+    while len(ibm_backend_cache) >= IBM_BACKEND_CACHE_SIZE:
+        ibm_backend_cache.pop(next(iter(ibm_backend_cache)), None) # Dicts keep insertion order: drop the oldest
+    ibm_backend_cache[name] = (backend, time.monotonic())
+    return backend
+
+
+def _get_ibm_sim_backends():
+    global ibm_sim_backends_cache
+    if ibm_sim_backends_cache and time.monotonic() - ibm_sim_backends_cache[1] < IBM_SIM_LIST_TTL:
+        return ibm_sim_backends_cache[0]
+    sims = service.backends(simulator=True, operational=True, instance=INSTANCE_FROM_ENV if INSTANCE_FROM_ENV else None)
+    ibm_sim_backends_cache = (sims, time.monotonic())
+    return sims
+
+
+def _invalidate_ibm_backends():
+    global ibm_sim_backends_cache
+    ibm_backend_cache.clear()
+    ibm_sim_backends_cache = None
+
+
+# --- IBM Runtime sessions: one warm Session + Sampler per backend, reused across requests ---
+IBM_SESSION_TTL = 8 * 60 # seconds; renewed before IBM's own session expiry kicks in
+ibm_sessions = {} # backend name -> (session or None, sampler, created_at)
+ibm_sessions_lock = threading.Lock()
+
+
+def _close_ibm_session(session):
+    if session is None:
+        return
+    try:
+        session.close()
+    except Exception as close_err:
+        print(f"Warning: Could not close IBM Runtime session: {close_err}")
+
+
+def _get_ibm_sampler(backend):
+    with ibm_sessions_lock: # Held while opening, so concurrent requests don't each open a session
+        entry = ibm_sessions.get(backend.name)
+        if entry and time.monotonic() - entry[2] < IBM_SESSION_TTL:
+            return entry[1]
+        if entry:
+            _close_ibm_session(entry[0])
+        try:
+            session = Session(backend=backend)
+            sampler = Sampler(mode=session)
+            print(f"Opened IBM Runtime session on {backend.name}.")
+        except Exception as session_err: # e.g. plans without session support; submit plain jobs instead
+            print(f"Could not open IBM Runtime session on {backend.name} ({session_err}). Using job mode.")
+            session, sampler = None, Sampler(mode=backend)
+        ibm_sessions[backend.name] = (session, sampler, time.monotonic())
+        return sampler
+
+
+def _drop_ibm_session(backend_name):
+    with ibm_sessions_lock:
+        entry = ibm_sessions.pop(backend_name, None)
+    if entry:
+        _close_ibm_session(entry[0])
+
+
+@atexit.register
+def _close_ibm_sessions():
+    with ibm_sessions_lock:
+        entries = list(ibm_sessions.values())
+        ibm_sessions.clear()
+    for session, _, _ in entries:
+        _close_ibm_session(session)
+
+
+# Shared Aer backends, one per method; building one per request re-creates its C++ state every time
+AER_QASM = AerSimulator()
+AER_SV = AerSimulator(method='statevector')
+AER_STAB = AerSimulator(method='stabilizer')
+# Counts for batched /simulate. max_job_size=1 gives each circuit its own job so the pool can run them in
+# parallel (Aer releases the GIL); without it the whole batch is still one serial job.
+AER_SIM = AerSimulator(executor=ThreadPoolExecutor(max_workers=os.cpu_count()), max_job_size=1)
+
+# Caps concurrent /simulate requests so threaded servers don't oversubscribe the CPU on top of Aer's own threads
+simulate_slots = threading.Semaphore(os.cpu_count() or 1)
+
+
+def _bounded_by(semaphore):
+    """Decorator that runs the view while holding semaphore."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with semaphore:
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Large statevectors go to the GPU (qiskit-aer-gpu / cuStateVec) when there is one
+USE_GPU_QUBITS = int(os.getenv('AER_GPU_MIN_Q', '12'))
+SV_MAX_QUBITS = 16
+SV_MAX_QUBITS_GPU = 24
+GPU_SV_SIM = None
+try:
+    if 'GPU' in AER_SV.available_devices():
+        GPU_SV_SIM = AerSimulator(method='statevector', device='GPU', cuStateVec_enable=True)
+        print(f"Aer GPU statevector simulator available. Used for circuits with >= {USE_GPU_QUBITS} qubits.")
+except Exception as gpu_err:
+    print(f"Warning: Could not set up Aer GPU simulator, using CPU only: {gpu_err}")
+
+
+# Clifford-only circuits can be simulated in polynomial time with the stabilizer method (AER_STAB)
+CLIFFORD_GATES = frozenset({'h', 's', 'sdg', 'cx', 'cz', 'x', 'y', 'z', 'swap', 'id', 'barrier'})
+STABILIZER_MIN_QUBITS = 10 # Below this the exact statevector is cheap anyway
+STABILIZER_MAX_QUBITS = 64
+STABILIZER_EXACT_MAX_SUPPORT = 16 # Exact probabilities while at most 2^16 basis states can be hit; sampled beyond
+
+
+def _is_clifford(circuit):
+    return {instr.operation.name for instr in circuit.data} <= CLIFFORD_GATES
+
+
+def _stabilizer_support_qubits(circuit):
+    """log2 of how many basis states a Clifford circuit's output can hit: the GF(2) rank of its stabilizers' X part."""
+    basis = []
+    for row in Clifford(circuit).stab_x:
+        value = int(''.join('1' if bit else '0' for bit in row), 2)
+        for b in basis:
+            value = min(value, value ^ b)
+        if value:
+            basis.append(value)
+    return len(basis)
+
+
+def _stabilizer_exact_probabilities(circuit, eps):
+    """Exact measurement probabilities of a Clifford circuit with a small support, via the stabilizer method."""
+    probs_circuit = circuit.copy()
+    probs_circuit.save_probabilities_dict()
+    probs = AER_STAB.run(probs_circuit).result().data(0)['probabilities']
+    fmt = f'0{circuit.num_qubits}b'
+    return {format(int(state), fmt): p for state, p in sorted(probs.items()) if p > eps}
+
+
+def _stabilizer_probabilities(circuit, shots):
+    """Measurement probabilities of a Clifford circuit estimated from stabilizer-method shots."""
+    sampled_circuit = circuit.measure_all(inplace=False)
+    counts = AER_STAB.run(sampled_circuit, shots=shots).result().get_counts()
+    probabilities = {}
+    for key, count in counts.items():
+        bitstring = key.split(' ')[0] # measure_all's register is the leftmost; the rest are unused cregs
+        probabilities[bitstring] = probabilities.get(bitstring, 0) + count / shots
+    return dict(sorted(probabilities.items()))
+
+
+def _orjson_response(payload):
+    """JSON response encoded by orjson; NumPy arrays and scalars in payload are serialised natively."""
+    return Response(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), mimetype='application/json')
+
+
+# precision query param -> (dtype name reported to the client, little-endian numpy dtype)
+SV_PRECISION_DTYPES = {'single': ('complex64', '<c8'), 'double': ('complex128', '<c16')}
+
+
+def _statevector_sim(num_qubits):
+    """Returns (simulator, backend_used label) for a statevector of num_qubits."""
+    if GPU_SV_SIM is not None and num_qubits >= USE_GPU_QUBITS:
+        return GPU_SV_SIM, "local_aer_simulator (statevector method, GPU)"
+    return AER_SV, "local_aer_simulator (statevector method)"
+
+
+def _max_statevector_qubits(num_qubits):
+    """Qubit cap for the simulator _statevector_sim picks for num_qubits; only a GPU run gets the higher one."""
+    sim, _ = _statevector_sim(num_qubits)
+    return SV_MAX_QUBITS_GPU if sim is GPU_SV_SIM else SV_MAX_QUBITS
+
+
+NON_UNITARY_OPS = frozenset({'measure', 'reset'})
+
+
+def _has_non_unitary_ops(circuit):
+    """True if measure/reset remain, i.e. mid-circuit ones that remove_final_measurements left in place."""
+    return any(instr.operation.name in NON_UNITARY_OPS for instr in circuit.data)
+
+
+def _run_statevector(circuit, sim):
+    """Final statevector of circuit (measurements already removed) as an ndarray. Adds a save instruction to circuit."""
+    circuit.save_statevector()
+    # Level 0 only: higher levels elide swaps into final_layout, which Aer ignores, permuting the qubits
+    transpiled_circuit = transpile(circuit, sim, optimization_level=0)
+    return np.asarray(sim.run(transpiled_circuit).result().get_statevector(transpiled_circuit))
+
+
+# Statevectors of unitary circuits are deterministic, so keep recent ones (raw ndarrays, LRU bounded by total bytes)
+SV_CACHE_BYTES = int(os.getenv("SV_CACHE_MB", "256")) * 1024 * 1024
+sv_cache = OrderedDict() # key -> read-only ndarray
+sv_cache_bytes = 0
+sv_cache_lock = threading.Lock()
+
+
+def _get_statevector(circuit, sim):
+    """Like _run_statevector, but served from sv_cache when the same circuit was computed before.
+
+    Only unitary circuits are accepted: with measure/reset left in, the result is one random collapse and caching it
+    would serve that same outcome forever.
+    """
+    global sv_cache_bytes
+    if _has_non_unitary_ops(circuit):
+        raise ValueError("Statevector is undefined for circuits with mid-circuit measurement or reset.")
+    try:
+        key = hashlib.sha256(f"{qiskit.qasm2.dumps(circuit)}\n// global_phase {circuit.global_phase}".encode()).digest()
+    except Exception: # Not expressible as QASM 2; just compute it
+        return _run_statevector(circuit, sim)
+    with sv_cache_lock:
+        statevector_data = sv_cache.get(key)
+        if statevector_data is not None:
+            sv_cache.move_to_end(key)
+            print("Statevector cache hit.")
+            return statevector_data
+
+    statevector_data = _run_statevector(circuit, sim)
+    statevector_data.setflags(write=False) # Shared between requests
+    if statevector_data.nbytes > SV_CACHE_BYTES:
+        return statevector_data
+    with sv_cache_lock:
+        if key not in sv_cache:
+            sv_cache[key] = statevector_data
+            sv_cache_bytes += statevector_data.nbytes
+        while sv_cache_bytes > SV_CACHE_BYTES:
+            _, evicted = sv_cache.popitem(last=False)
+            sv_cache_bytes -= evicted.nbytes
+    return statevector_data
+
+
+# --- Circuit caches (keyed by SHA-256 of the submitted QASM) ---
+# lru_cache needs hashable args, so the raw QASM / backend objects are looked up by key on a miss.
+TRANSPILE_CACHE_SIZE = 256
+qasm_by_hash = {} # qasm_hash -> [qasm_code, requests using it]; see _pinned_qasm
+qasm_by_hash_lock = threading.Lock()
+LOCAL_AER_BACKEND = "local_aer_simulator"
+backend_by_name = {LOCAL_AER_BACKEND: AER_QASM}
+
+
+def _parse_qasm(qasm_code):
+    """Parses OpenQASM 2 exactly like QuantumCircuit.from_qasm_str (qelib1 extras such as swap/sx, asin/acos/atan
+    in parameters, non-strict syntax), but raising QASM2ParseError directly so endpoints can answer it with a 400."""
+    return qasm_loads(qasm_code, include_path=LEGACY_INCLUDE_PATH, custom_instructions=LEGACY_CUSTOM_INSTRUCTIONS,
+                      custom_classical=LEGACY_CUSTOM_CLASSICAL, strict=False)
+
+
+# qreg q[5]; (OpenQASM 2) and qubit[5] q; (OpenQASM 3) declarations, for size checks without parsing
+QREG_DECL_RE = re.compile(r'qreg\s+\w+\s*\[(\d+)\]|qubit\s*\[(\d+)\]')
+LINE_COMMENT_RE = re.compile(r'//[^\n]*')
+
+
+def _declared_qubits(qasm_code):
+    """Total qubits declared in the QASM text, found by regex. Lets oversized circuits be rejected before parsing."""
+    if not isinstance(qasm_code, str):
+        return 0
+    uncommented = LINE_COMMENT_RE.sub('', qasm_code) # A commented-out `// qreg q[40];` declares nothing
+    return sum(int(qreg or qubit) for qreg, qubit in QREG_DECL_RE.findall(uncommented))
+
+
+def _qasm_hash(qasm_code):
+    return hashlib.sha256(str(qasm_code).encode()).hexdigest()
+
+
+@contextlib.contextmanager
+def _pinned_qasm(qasm_code):
+    """Yields the QASM's hash, keeping the QASM in qasm_by_hash until the block ends.
+
+    Any cache keyed by the hash may miss partway through a request (another request evicted it), so the source has to
+    stay available for the whole request, not just the first parse. Refcounted for concurrent requests on one circuit.
+    """
+    qasm_hash = _qasm_hash(qasm_code)
+    with qasm_by_hash_lock:
+        qasm_by_hash.setdefault(qasm_hash, [qasm_code, 0])[1] += 1
+    try:
+        yield qasm_hash
+    finally:
+        with qasm_by_hash_lock:
+            entry = qasm_by_hash[qasm_hash]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del qasm_by_hash[qasm_hash]
+
+
+@functools.lru_cache(maxsize=TRANSPILE_CACHE_SIZE)
+def _get_counts_circuit(qasm_hash):
+    """Parses the QASM and adds measurements if needed. The returned circuit is shared; don't mutate it."""
+    circuit = _parse_qasm(qasm_by_hash[qasm_hash][0]) # Callers hold _pinned_qasm
+    num_qubits, num_clbits = circuit.num_qubits, circuit.num_clbits
+    print(f"Counts Sim: Circuit from QASM. Qubits: {num_qubits}, Classical Bits: {num_clbits}")
+
+    # One pass over circuit.data for both "is anything measured" and "highest clbit measured"
+    has_measure_ops_in_qasm = False
+    max_clbit_measured = -1
+    for instr in circuit.data:
+        if instr.operation.name == 'measure':
+            has_measure_ops_in_qasm = True
+            for clbit in instr.clbits:
+                clbit_index = circuit.find_bit(clbit).index
+                if clbit_index > max_clbit_measured: max_clbit_measured = clbit_index
 
-    has_measure_ops_in_qasm = any(instr.operation.name == 'measure' for instr in circuit.data)
     if not has_measure_ops_in_qasm:
-        if circuit.num_qubits > 0:
-            if circuit.num_clbits < circuit.num_qubits:
+        if num_qubits > 0:
+            if num_clbits < num_qubits:
                 while circuit.cregs: circuit.remove_register(circuit.cregs[0])
-                creg_measure_all = qiskit.circuit.ClassicalRegister(circuit.num_qubits, 'c_auto')
+                creg_measure_all = qiskit.circuit.ClassicalRegister(num_qubits, 'c_auto')
                 circuit.add_register(creg_measure_all)
             circuit.measure_all(inplace=True)
             print("Counts Sim: measure_all() added.")
     else:
         print("Counts Sim: Circuit from QASM already contains measurement operations.")
-        max_clbit_measured = -1
-        for instr in circuit.data:
-            if instr.operation.name == 'measure':
-                for clbit in instr.clbits:
-                    if clbit.index > max_clbit_measured: max_clbit_measured = clbit.index
-        if max_clbit_measured != -1 and circuit.num_clbits <= max_clbit_measured:
-            print(f"Warning: QASM measures up to cbit {max_clbit_measured} but circuit has {circuit.num_clbits} clbits.")
+        if num_clbits <= max_clbit_measured:
+            print(f"Warning: QASM measures up to cbit {max_clbit_measured} but circuit has {num_clbits} clbits.")
+    return circuit
+
+
+# --- Circuit templates: circuits that differ only in rotation angles (parameter sweeps) share one transpile ---
+ROTATION_GATES = frozenset({'rx', 'ry', 'rz', 'p', 'u', 'u1', 'u2', 'u3', 'crx', 'cry', 'crz', 'cp', 'cu1', 'cu3', 'rxx', 'ryy', 'rzz'})
+# Only standard gates can be templated: a user-defined `gate foo` could have a different body under the same name
+TEMPLATE_SAFE_OPS = frozenset(get_standard_gate_name_mapping()) | {'barrier'}
+template_by_key = OrderedDict() # Most recently used last; only read on a _get_transpiled_template miss
+template_by_key_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=TRANSPILE_CACHE_SIZE)
+def _get_template(qasm_hash):
+    """(template key, template circuit, angles) for the counts circuit, or None if it can't or needn't be templated.
+
+    The template is the circuit with every rotation angle replaced by an element of ParameterVector('θ'); the key
+    hashes everything else (registers, gates, qubits, global phase), so circuits that only differ in angles share it.
+    """
+    circuit = _get_counts_circuit(qasm_hash)
+    if any(instr.operation.name not in TEMPLATE_SAFE_OPS for instr in circuit.data):
+        return None
+    num_angles = sum(len(instr.operation.params) for instr in circuit.data if instr.operation.name in ROTATION_GATES)
+    if num_angles == 0:
+        return None
+
+    thetas = ParameterVector('θ', num_angles)
+    template = circuit.copy_empty_like()
+    angles = []
+    key_parts = [tuple(qreg.size for qreg in circuit.qregs), tuple(creg.size for creg in circuit.cregs), circuit.global_phase]
+    for instr in circuit.data:
+        op = instr.operation
+        if op.name in ROTATION_GATES:
+            op = op.copy()
+            op.params = [thetas[len(angles) + i] for i in range(len(op.params))]
+            angles.extend(float(value) for value in instr.operation.params)
+        key_parts.append((op.name, tuple(circuit.find_bit(q).index for q in instr.qubits),
+                          tuple(circuit.find_bit(c).index for c in instr.clbits), () if op.name in ROTATION_GATES else tuple(op.params)))
+        template.append(op, instr.qubits, instr.clbits, copy=False)
+    return hashlib.sha256(repr(key_parts).encode()).hexdigest(), template, tuple(angles)
+
+
+@functools.lru_cache(maxsize=TRANSPILE_CACHE_SIZE)
+def _get_transpiled_template(template_key, backend_name, backend_version, optimization_level=None):
+    print(f"Counts Sim: Transpiling template for backend: {backend_name} (version {backend_version})")
+    return transpile(template_by_key[template_key], backend=backend_by_name[backend_name], optimization_level=optimization_level)
+
+
+@functools.lru_cache(maxsize=TRANSPILE_CACHE_SIZE)
+def _get_transpiled(qasm_hash, backend_name, backend_version, optimization_level=None):
+    """Transpiled counts circuit for a backend. backend_version is only part of the key, so a backend update misses.
+
+    optimization_level=None means Qiskit's default.
+    """
+    template = _get_template(qasm_hash)
+    if template is None:
+        print(f"Counts Sim: Transpiling for backend: {backend_name} (version {backend_version})")
+        return transpile(_get_counts_circuit(qasm_hash), backend=backend_by_name[backend_name], optimization_level=optimization_level)
+
+    # Only the angles are new: rebind them on the cached transpiled template (O(gates), no transpiler passes)
+    template_key, template_circuit, angles = template
+    with template_by_key_lock:
+        template_by_key.setdefault(template_key, template_circuit)
+        template_by_key.move_to_end(template_key)
+        while len(template_by_key) > TRANSPILE_CACHE_SIZE:
+            template_by_key.popitem(last=False)
+    transpiled_template = _get_transpiled_template(template_key, backend_name, backend_version, optimization_level)
+    # Bind by vector index: the cached template may come from another circuit, with other Parameter objects
+    values = {param: angles[param.index] for param in transpiled_template.parameters}
+    return transpiled_template.assign_parameters(values, inplace=False, strict=False)
+
+
+def _aer_prepared(qasm_hash):
+    """Counts circuit ready for AER_QASM.run, transpiled once and then served from cache.
+
+    Aer supports nearly every standard gate natively, so optimization_level=0 (basis/layout only) is enough. Handing
+    Aer a prepared circuit also keeps it from re-running its own transpilation on every call.
+    """
+    return _get_transpiled(qasm_hash, LOCAL_AER_BACKEND, AER_QASM.backend_version, 0)
+
+
+# --- Semantic counts cache: equivalent circuits share results via their fully reduced ZX-graph ---
+ZX_CACHE_SIZE = int(os.getenv("ZX_CACHE_SIZE", "512")) # 0 disables the cache
+ZX_MAX_GATES = int(os.getenv("ZX_MAX_GATES", "256")) # full_reduce gets slower than just simulating beyond this
+zx_counts_cache = OrderedDict()
+zx_counts_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=TRANSPILE_CACHE_SIZE)
+def _get_zx_key(qasm_hash):
+    """Canonical key for the counts circuit, or None if the cache is off, pyzx is missing or can't handle the circuit.
+
+    Equal keys mean the same ZX-graph (so the same unitary up to global phase) followed by the same measurements.
+    """
+    if pyzx is None or ZX_CACHE_SIZE <= 0:
+        return None
+    circuit = _get_counts_circuit(qasm_hash)
+    if len(circuit.data) > ZX_MAX_GATES:
+        return None
+    try:
+        unitary_part = circuit.remove_final_measurements(inplace=False)
+        if _has_non_unitary_ops(unitary_part):
+            return None # Mid-circuit measurement/reset isn't a unitary, so the ZX-graph wouldn't describe it
+        g = pyzx.Circuit.from_qasm(qiskit.qasm2.dumps(unitary_part)).to_graph()
+        pyzx.simplify.full_reduce(g)
+    except Exception as zx_err: # Mid-circuit measurements, gates pyzx doesn't know, ...
+        print(f"Counts Sim: No ZX cache key for this circuit: {zx_err}")
+        return None
+
+    index = {v: i for i, v in enumerate(sorted(g.vertices()))}
+    vertices = tuple((int(g.type(v)), g.phase(v) % 2) for v in sorted(g.vertices()))
+    edges = tuple(sorted((min(index[a], index[b]), max(index[a], index[b]), int(g.edge_type((a, b)))) for a, b in g.edges()))
+    boundary = (tuple(index[v] for v in g.inputs()), tuple(index[v] for v in g.outputs()))
+    measurements = tuple((circuit.find_bit(instr.qubits[0]).index, circuit.find_bit(instr.clbits[0]).index)
+                         for instr in circuit.data if instr.operation.name == 'measure')
+    cregs = tuple(creg.size for creg in circuit.cregs) # Register layout decides the spacing in count keys
+    return (vertices, edges, boundary, measurements, cregs)
+
+
+def _zx_exact_probs(circuit, zx_key):
+    """Exact outcome distribution {count key: probability} for an ideal run, or None if it's too big to compute.
+
+    The count keys follow Aer's layout: one bitstring per classical register (clbit 0 rightmost), last register first.
+    """
+    if zx_key is None or circuit.num_qubits > SV_MAX_QUBITS:
+        return None
+    (_, _, _, measurements, cregs), _ = zx_key
+    if sum(cregs) != circuit.num_clbits:
+        return None # Clbits outside any register; no reliable key layout
+    try:
+        statevector_data = _run_statevector(circuit.remove_final_measurements(inplace=False), AER_SV)
+    except Exception as sv_err: # Fall back to caching the sampled counts
+        print(f"Counts Sim: No exact distribution for the ZX cache: {sv_err}")
+        return None
+    probs = np.abs(statevector_data) ** 2
+    basis = np.arange(probs.size)
+    clbit_values = {}
+    for qubit, clbit in measurements: # A later measure into the same clbit overwrites the earlier one
+        clbit_values[clbit] = (basis >> qubit) & 1
+    outcomes = np.zeros(probs.size, dtype=np.int64)
+    for clbit, bits in clbit_values.items():
+        outcomes |= bits << clbit
+    values, inverse = np.unique(outcomes, return_inverse=True)
+    totals = np.bincount(inverse, weights=probs)
+
+    exact = {}
+    for value, prob in zip(values.tolist(), totals.tolist()):
+        if prob < 1e-12:
+            continue
+        bits = format(value, f'0{circuit.num_clbits}b')[::-1] # bits[i] is clbit i
+        registers, start = [], 0
+        for size in cregs:
+            registers.append(bits[start:start + size][::-1])
+            start += size
+        exact[' '.join(reversed(registers))] = prob
+    return exact
+
+
+def _get_zx_cached_counts(key, shots):
+    """Cached result for key with counts resampled to `shots`, or None on a miss.
+
+    Exact entries serve any shot count. Sampled entries only serve requests up to the shots they were built from,
+    so a small run can't stand in for a larger one.
+    """
+    if key is None or ZX_CACHE_SIZE <= 0:
+        return None
+    with zx_counts_cache_lock:
+        entry = zx_counts_cache.get(key)
+        if entry is None or (not entry["exact"] and entry["shots"] < shots):
+            return None
+        zx_counts_cache.move_to_end(key)
+        outcomes = list(entry["counts"])
+        weights = np.array([entry["counts"][k] for k in outcomes], dtype=float)
+    resampled = np.random.multinomial(shots, weights / weights.sum())
+    counts = {k: int(n) for k, n in zip(outcomes, resampled) if n > 0}
+    return {"message": entry["message"], "backend_used": entry["backend_used"], "cache_hit": True, "shots": shots, "counts": counts}
+
+
+def _store_zx_counts(key, message, backend_used, counts, shots, exact_probs=None):
+    """Caches the exact distribution when given, otherwise adds the sampled counts to what's already stored."""
+    if key is None or ZX_CACHE_SIZE <= 0 or not (counts or exact_probs):
+        return
+    with zx_counts_cache_lock:
+        entry = zx_counts_cache.get(key)
+        if exact_probs:
+            entry = {"message": message, "backend_used": backend_used, "exact": True, "shots": None, "counts": dict(exact_probs)}
+        elif entry is None:
+            entry = {"message": message, "backend_used": backend_used, "exact": False, "shots": shots, "counts": dict(counts)}
+        elif not entry["exact"]:
+            merged = dict(entry["counts"])
+            for outcome, n in counts.items():
+                merged[outcome] = merged.get(outcome, 0) + n
+            entry = {**entry, "shots": entry["shots"] + shots, "counts": merged}
+        zx_counts_cache[key] = entry
+        zx_counts_cache.move_to_end(key)
+        while len(zx_counts_cache) > ZX_CACHE_SIZE:
+            zx_counts_cache.popitem(last=False)
+
+
+def _simulate_batch_for_counts(qasm_codes, shots):
+    """Runs a list of QASM strings as one Aer submission. Returns counts in input order."""
+    circuits = []
+    for i, qasm_code in enumerate(qasm_codes):
+        with _pinned_qasm(qasm_code) as qasm_hash: # The Aer circuit is ready after this; no more lookups
+            try:
+                _get_counts_circuit(qasm_hash)
+                circuits.append(_aer_prepared(qasm_hash))
+            except Exception as qasm_err:
+                return {"error": f"Invalid QASM input at index {i}: {qasm_err}"}, 400
+
+    print(f"Counts Sim: Running batch of {len(circuits)} circuits on Aer.")
+    try:
+        result = AER_SIM.run(circuits, shots=shots).result()
+        counts = [result.get_counts(i) for i in range(len(circuits))]
+        print("Counts Sim: Local Aer batch simulation successful.")
+        return {"message": "Simulation successful (Local Aer)!", "backend_used": "local_aer_simulator", "shots": shots, "counts": counts}, 200
+    except Exception as aer_err:
+        import traceback
+        print(f"Counts Sim: Error during local Aer batch simulation: {aer_err}"); traceback.print_exc()
+        return {"error": f"Error during local Aer simulation: {aer_err}"}, 500
+
+
+@app.route('/simulate', methods=['POST'])
+@_bounded_by(simulate_slots)
+def simulate_circuit_for_counts(): # Renamed for clarity
+    data = request.get_json()
+    if not data or 'qasm' not in data:
+        return jsonify({"error": "Missing 'qasm' in request body"}), 400
+
+    if data.get('async'): # Queue it and let the client poll /tasks/<task_id>
+        return _enqueue_simulate_task({k: v for k, v in data.items() if k != 'async'})
+
+    payload, status = simulate_for_counts(data['qasm'], data.get('shots', 1024), data.get('backend', 'ibmq_qasm_simulator'))
+    return jsonify(payload), status
+
+
+def simulate_for_counts(qasm_code, shots=1024, requested_ibm_backend_name='ibmq_qasm_simulator'):
+    """The /simulate logic without Flask: returns (response payload dict, HTTP status).
+
+    qasm_code is one QASM string or a list of them (batch, always local Aer). Shared by the view and worker.py.
+    """
+    if isinstance(qasm_code, list): # Batch: always local Aer, counts come back as a list in input order
+        if not qasm_code:
+            return {"error": "'qasm' list is empty"}, 400
+        return _simulate_batch_for_counts(qasm_code, shots)
+
+    with _pinned_qasm(qasm_code) as qasm_hash:
+        return _simulate_one_for_counts(qasm_hash, shots, requested_ibm_backend_name)
+
+
+def _simulate_one_for_counts(qasm_hash, shots, requested_ibm_backend_name):
+    try:
+        circuit = _get_counts_circuit(qasm_hash) # Cache hit skips parsing entirely
+    except Exception as qasm_err:
+        return {"error": f"Invalid QASM input: {qasm_err}"}, 400
+
+    # Results depend on where the circuit runs, so the target is part of the semantic key
+    zx_key = _get_zx_key(qasm_hash)
+    if zx_key is not None:
+        zx_key = (zx_key, requested_ibm_backend_name if service and ibm_simulators_available else None)
+    cached_response = _get_zx_cached_counts(zx_key, shots)
+    if cached_response is not None:
+        print(f"Counts Sim: Semantic cache hit. Counts: {cached_response['counts']}")
+        return cached_response, 200
 
     if service and ibm_simulators_available:
         selected_ibm_backend_obj = None
         actual_ibm_backend_name = None
         try:
-            backend_instance_filter = INSTANCE_FROM_ENV if INSTANCE_FROM_ENV else None
-            try:
-                selected_ibm_backend_obj = service.backend(name=requested_ibm_backend_name, instance=backend_instance_filter)
-                actual_ibm_backend_name = selected_ibm_backend_obj.name
-            except Exception:
-                sims = service.backends(simulator=True, operational=True, instance=backend_instance_filter)
-                if not sims: raise ValueError("No IBM simulators available now.")
-                selected_ibm_backend_obj = sims[0]
-                actual_ibm_backend_name = selected_ibm_backend_obj.name
-            
-            print(f"Counts Sim: Transpiling for IBM backend: {actual_ibm_backend_name}")
-            transpiled_circuit = transpile(circuit, backend=selected_ibm_backend_obj)
-            program_inputs = {'circuits': transpiled_circuit, 'run_options': {'shots': shots}}
-            print(f"Counts Sim: Running on IBM backend {actual_ibm_backend_name} via circuit-runner...")
-            job = service.run(program_id="circuit-runner", options={'backend': actual_ibm_backend_name}, inputs=program_inputs)
-            result = job.result()
-            counts = {}
-            if hasattr(result, 'quasi_dists') and result.quasi_dists:
-                counts_data = result.quasi_dists[0]
-                num_clbits_for_counts = transpiled_circuit.num_clbits if transpiled_circuit.num_clbits > 0 else circuit.num_qubits
-                if num_clbits_for_counts > 0:
-                    counts = {f"{int(key):0{num_clbits_for_counts}b}": int(value * shots) for key, value in counts_data.items()}
-                else: # Should not happen if there are measurements
-                    counts = {str(key): int(value * shots) for key, value in counts_data.items()}
-            elif hasattr(result, 'get_counts'): counts = result.get_counts(transpiled_circuit)
-            elif isinstance(result, list) and result and hasattr(result[0], 'data') and hasattr(result[0].data, 'counts'): counts = result[0].data.counts
-            
+            selected_ibm_backend_obj = _get_ibm_backend(requested_ibm_backend_name) # Falls back to an available simulator
+            actual_ibm_backend_name = selected_ibm_backend_obj.name
+
+            backend_by_name[actual_ibm_backend_name] = selected_ibm_backend_obj
+            transpiled_circuit = _get_transpiled(qasm_hash, actual_ibm_backend_name, getattr(selected_ibm_backend_obj, 'backend_version', None))
+            print(f"Counts Sim: Running on IBM backend {actual_ibm_backend_name} via Sampler...")
+            job = _get_ibm_sampler(selected_ibm_backend_obj).run([transpiled_circuit], shots=shots)
+            # SamplerV2 returns one PrimitiveResult per PUB; join_data merges the classical registers
+            counts = job.result()[0].join_data().get_counts()
             print(f"Counts Sim: IBM Job successful. Counts: {counts}")
-            return jsonify({"message": "Simulation successful (IBM Quantum)!", "job_id": job.job_id(), "backend_used": actual_ibm_backend_name, "shots": shots, "counts": counts})
+            _store_zx_counts(zx_key, "Simulation successful (IBM Quantum)!", actual_ibm_backend_name, counts, shots)
+            return {"message": "Simulation successful (IBM Quantum)!", "job_id": job.job_id(), "backend_used": actual_ibm_backend_name, "shots": shots, "counts": counts}, 200
         except Exception as ibm_run_err:
             print(f"Counts Sim: Error during IBM Quantum execution: {ibm_run_err}. Falling back to local Aer.")
-    
+            _invalidate_ibm_backends() # The cached backend may be the stale part; look it up again next time
+            if actual_ibm_backend_name: _drop_ibm_session(actual_ibm_backend_name) # Expired/closed session; open a new one next time
+        # The Aer result below belongs to the local key; under the IBM key it would stop IBM being retried
+        if zx_key is not None:
+            zx_key = (zx_key[0], None)
+            cached_response = _get_zx_cached_counts(zx_key, shots)
+            if cached_response is not None:
+                print(f"Counts Sim: Semantic cache hit (local Aer fallback). Counts: {cached_response['counts']}")
+                return cached_response, 200
+
     print("Counts Sim: Using local Qiskit Aer simulator.")
     try:
-        aer_sim = AerSimulator()
+        aer_circuit = _aer_prepared(qasm_hash) # Warm hits skip transpilation
         print(f"Counts Sim: Running on Aer. Circuit num_qubits: {circuit.num_qubits}, num_clbits: {circuit.num_clbits}")
-        job = aer_sim.run(circuit, shots=shots)
+        job = AER_QASM.run(aer_circuit, shots=shots)
         result = job.result()
-        counts = result.get_counts(circuit)
+        counts = result.get_counts(aer_circuit)
         print(f"Counts Sim: Local Aer simulation successful. Counts: {counts}")
-        return jsonify({"message": "Simulation successful (Local Aer)!", "backend_used": "local_aer_simulator", "shots": shots, "counts": counts})
+        # Aer is noiseless, so cache the exact distribution instead of this run's samples when it's cheap to get
+        _store_zx_counts(zx_key, "Simulation successful (Local Aer)!", "local_aer_simulator", counts, shots,
+                         _zx_exact_probs(circuit, zx_key))
+        return {"message": "Simulation successful (Local Aer)!", "backend_used": "local_aer_simulator", "shots": shots, "counts": counts}, 200
     except Exception as aer_err:
         import traceback
         print(f"Counts Sim: Error during local Aer simulation: {aer_err}"); traceback.print_exc()
-        return jsonify({"error": f"Error during local Aer simulation: {aer_err}"}), 500
+        return {"error": f"Error during local Aer simulation: {aer_err}"}, 500
 
 # --- NEW ENDPOINT: Get Statevector ---
 @app.route('/get_statevector', methods=['POST'])
@@ -173,43 +758,46 @@ def get_statevector_endpoint():
     if not data or 'qasm' not in data:
         return jsonify({"error": "Missing 'qasm' in request body"}), 400
     qasm_code = data['qasm']
+    # Amplitudes are sent as little-endian complex64 unless the client asks for double precision
+    precision = request.args.get('precision', 'single')
+    if precision not in SV_PRECISION_DTYPES:
+        return jsonify({"error": f"Invalid precision '{precision}', expected 'single' or 'double'"}), 400
+    declared_qubits = _declared_qubits(qasm_code)
+    if declared_qubits > _max_statevector_qubits(declared_qubits):
+        return jsonify({"error": f"Statevector for {declared_qubits} qubits is too large to compute quickly/reliably."}), 400
     try:
-        circuit = QuantumCircuit.from_qasm_str(qasm_code)
+        circuit = _parse_qasm(qasm_code)
         # Remove any measurements if present, as statevector is pre-measurement
         circuit.remove_final_measurements(inplace=True) # Modifies circuit
         
         print(f"Statevector: Circuit from QASM. Qubits: {circuit.num_qubits}")
         if circuit.num_qubits == 0:
             return jsonify({"error": "Circuit has no qubits for statevector."}), 400
-        if circuit.num_qubits > 16: # Aer statevector can get very large
+        if circuit.num_qubits > _max_statevector_qubits(circuit.num_qubits): # Aer statevector can get very large
              return jsonify({"error": f"Statevector for {circuit.num_qubits} qubits is too large to compute quickly/reliably."}), 400
 
+        if _has_non_unitary_ops(circuit): # Aer would return one random post-measurement state
+            return jsonify({"error": "Statevector is undefined for circuits with mid-circuit measurement or reset."}), 400
 
-        # Use AerSimulator for statevector
-        aer_sim = AerSimulator(method='statevector')
-        # No transpilation typically needed for statevector method with standard gates for Aer
-        
-        # Option 1: Using save_statevector instruction (more explicit)
-        # circuit.save_statevector() # This adds the save instruction
-        # result = aer_sim.run(circuit).result()
-        # statevector_data = result.get_statevector(circuit)
-
-        # Option 2: Simulating directly and getting Statevector object (often simpler)
-        # For this, ensure the circuit doesn't have classical registers or measurements that might interfere
-        # with statevector interpretation. `remove_final_measurements` helps.
-        statevector_obj = Statevector(circuit) # Directly from circuit
-        statevector_data = statevector_obj.data
-        
-        # Convert complex numbers to [real, imag] pairs for JSON serialization
-        sv_serializable = [[val.real, val.imag] for val in statevector_data]
+        # Runs on Aer's compiled statevector kernels rather than quantum_info's Python evolution
+        sv_sim, backend_used = _statevector_sim(circuit.num_qubits)
+        statevector_data = _get_statevector(circuit, sv_sim)
+
+        # One base64 string of the raw buffer instead of 2^n nested [real, imag] lists
+        dtype_name, dtype = SV_PRECISION_DTYPES[precision]
+        sv_buffer = np.ascontiguousarray(statevector_data, dtype=dtype)
         
-        print(f"Statevector: Local Aer calculation successful. Length: {len(sv_serializable)}")
-        return jsonify({
+        print(f"Statevector: Local Aer calculation successful. Length: {sv_buffer.size}")
+        return _orjson_response({
             "message": "Statevector calculation successful (Local Aer)!",
-            "backend_used": "local_aer_simulator (statevector method)",
+            "backend_used": backend_used,
             "num_qubits": circuit.num_qubits,
-            "statevector": sv_serializable
+            "statevector_b64": base64.b64encode(sv_buffer.tobytes()).decode('ascii'),
+            "dtype": dtype_name,
+            "shape": [sv_buffer.size]
         })
+    except QASM2ParseError as qasm_err:
+        return jsonify({"error": f"Invalid QASM input: {qasm_err}"}), 400
     except Exception as e:
         import traceback
         print(f"Statevector: Error during local Aer statevector calculation: {e}"); traceback.print_exc()
@@ -223,31 +811,146 @@ def get_probabilities_endpoint():
         return jsonify({"error": "Missing 'qasm' in request body"}), 400
     qasm_code = data['qasm']
     try:
-        circuit = QuantumCircuit.from_qasm_str(qasm_code)
+        eps = float(data.get('eps', 1e-12)) # Basis states at or below this probability are left out
+        top_k = int(request.args['top_k']) if 'top_k' in request.args else None
+        shots = int(data.get('shots', 1024)) # Only used when the stabilizer path has to sample
+    except (TypeError, ValueError) as param_err:
+        return jsonify({"error": f"Invalid 'eps', 'top_k' or 'shots': {param_err}"}), 400
+    if top_k is not None and top_k < 1:
+        return jsonify({"error": "'top_k' must be a positive integer"}), 400
+    if shots < 1:
+        return jsonify({"error": "'shots' must be a positive integer"}), 400
+    declared_qubits = _declared_qubits(qasm_code) # Clifford circuits may go up to the stabilizer cap
+    if declared_qubits > max(STABILIZER_MAX_QUBITS, _max_statevector_qubits(declared_qubits)):
+        return jsonify({"error": f"Probabilities for {declared_qubits} qubits is too large."}), 400
+    try:
+        circuit = _parse_qasm(qasm_code)
         circuit.remove_final_measurements(inplace=True)
         
         print(f"Probabilities: Circuit from QASM. Qubits: {circuit.num_qubits}")
         if circuit.num_qubits == 0:
             return jsonify({"error": "Circuit has no qubits for probabilities."}), 400
-        if circuit.num_qubits > 16:
+        if _has_non_unitary_ops(circuit):
+            return jsonify({"error": "Probabilities from statevector are undefined for circuits with mid-circuit measurement or reset."}), 400
+
+        if circuit.num_qubits > STABILIZER_MIN_QUBITS and _is_clifford(circuit):
+            if circuit.num_qubits > STABILIZER_MAX_QUBITS:
+                return jsonify({"error": f"Probabilities for {circuit.num_qubits} qubits is too large, even for the stabilizer method."}), 400
+            exact = _stabilizer_support_qubits(circuit) <= STABILIZER_EXACT_MAX_SUPPORT
+            # A large support within the statevector cap falls through to the (exact) statevector path below
+            if exact or circuit.num_qubits > _max_statevector_qubits(circuit.num_qubits):
+                if exact:
+                    probabilities_dict = _stabilizer_exact_probabilities(circuit, eps)
+                else:
+                    probabilities_dict = _stabilizer_probabilities(circuit, shots)
+                if top_k is not None:
+                    top_states = sorted(probabilities_dict, key=probabilities_dict.get, reverse=True)[:top_k]
+                    probabilities_dict = {k: probabilities_dict[k] for k in sorted(top_states)}
+                print(f"Probabilities: Local Aer stabilizer {'calculation' if exact else 'sampling'} successful. Num states: {len(probabilities_dict)}")
+                payload = {
+                    "message": "Probabilities calculation successful (Local Aer, stabilizer method)!" if exact
+                               else "Probabilities estimate successful (Local Aer, sampled with the stabilizer method)!",
+                    "backend_used": "local_aer_simulator (stabilizer method)",
+                    "num_qubits": circuit.num_qubits,
+                    "probabilities": probabilities_dict
+                }
+                if not exact:
+                    payload["shots"] = shots
+                return _orjson_response(payload)
+
+        if circuit.num_qubits > _max_statevector_qubits(circuit.num_qubits):
              return jsonify({"error": f"Probabilities for {circuit.num_qubits} qubits from statevector is too large."}), 400
 
-        statevector_obj = Statevector(circuit)
-        probabilities_dict = statevector_obj.probabilities_dict() # Returns {'001': 0.25, ...}
+        sv_sim, backend_used = _statevector_sim(circuit.num_qubits)
+        # Shares the statevector cache with /get_statevector; a hit skips Aer entirely.
+        # |amplitude|^2 in float32, one C-level pass each for real/imag: half the memory traffic of float64,
+        # and ~7 significant digits is far finer than any shot noise it gets compared to.
+        sv = np.ascontiguousarray(_get_statevector(circuit, sv_sim), dtype=np.complex64)
+        p = np.empty(sv.size, dtype=np.float32)
+        np.square(sv.real, out=p)
+        p += np.square(sv.imag)
+        # Only the (usually sparse) support gets Python str/float objects, not all 2^n basis states
+        idx = np.flatnonzero(p > eps)
+        if top_k is not None and top_k < idx.size:
+            idx = np.sort(np.argpartition(p, -top_k)[-top_k:])
+            idx = idx[p[idx] > eps]
+        fmt = f'0{circuit.num_qubits}b'
+        probabilities_dict = {format(int(i), fmt): p[i] for i in idx} # {'001': 0.25, ...}; orjson writes the float32s as is
         
         print(f"Probabilities: Local Aer calculation successful. Num states: {len(probabilities_dict)}")
-        return jsonify({
+        return _orjson_response({
             "message": "Probabilities calculation successful (Local Aer, from statevector)!",
-            "backend_used": "local_aer_simulator (statevector method)",
+            "backend_used": backend_used,
             "num_qubits": circuit.num_qubits,
-            "probabilities": probabilities_dict # Already JSON serializable
+            "probabilities": probabilities_dict
         })
+    except QASM2ParseError as qasm_err:
+        return jsonify({"error": f"Invalid QASM input: {qasm_err}"}), 400
     except Exception as e:
         import traceback
         print(f"Probabilities: Error during local Aer probability calculation: {e}"); traceback.print_exc()
         return jsonify({"error": f"Error during probability calculation: {e}"}), 500
 
 
+# --- Async /simulate tasks ---
+# Tasks go on a Redis list consumed by worker.py and results are stored in Redis, so any server process can answer
+# /tasks/<id>. Without REDIS_URL async requests are refused: an in-process store isn't shared between gunicorn workers.
+REDIS_URL = os.getenv("REDIS_URL")
+TASK_QUEUE_KEY = "quant:simulate_tasks"
+TASK_KEY_PREFIX = "quant:task:"
+TASK_RESULT_TTL = int(os.getenv("TASK_RESULT_TTL", "86400")) # seconds
+
+redis_client = None
+if REDIS_URL:
+    if redis is None:
+        print("Warning: REDIS_URL is set but the 'redis' package is not installed. Async tasks are disabled.")
+    else:
+        redis_client = redis.Redis.from_url(REDIS_URL)
+        print(f"Async /simulate tasks will be queued on Redis at {REDIS_URL}.")
+
+
+def _save_task(task_id, record):
+    redis_client.set(TASK_KEY_PREFIX + task_id, json.dumps(record), ex=TASK_RESULT_TTL)
+
+
+def _load_task(task_id):
+    record = redis_client.get(TASK_KEY_PREFIX + task_id)
+    return json.loads(record) if record else None
+
+
+def run_simulate_task(task_id, task):
+    """Runs a queued /simulate body and stores its progress and result under task_id (called by worker.py)."""
+    _save_task(task_id, {"status": "running"})
+    try:
+        payload, status = simulate_for_counts(task['qasm'], task.get('shots', 1024), task.get('backend', 'ibmq_qasm_simulator'))
+        _save_task(task_id, {"status": "done" if status < 400 else "error", "http_status": status, "result": payload})
+    except Exception as task_err:
+        print(f"Counts Sim: Task {task_id} failed: {task_err}")
+        _save_task(task_id, {"status": "error", "http_status": 500, "result": {"error": f"Task failed: {task_err}"}})
+
+
+def _enqueue_simulate_task(task):
+    if redis_client is None:
+        return jsonify({"error": "Async simulations need REDIS_URL (and the 'redis' package) on the server."}), 503
+    task_id = uuid.uuid4().hex
+    _save_task(task_id, {"status": "queued"})
+    redis_client.lpush(TASK_QUEUE_KEY, json.dumps({"task_id": task_id, "task": task}))
+    print(f"Counts Sim: Queued task {task_id}.")
+    return jsonify({"message": "Simulation queued.", "task_id": task_id, "status": "queued"}), 202
+
+
+@app.route('/tasks/<task_id>', methods=['GET'])
+def get_task_endpoint(task_id):
+    if redis_client is None:
+        return jsonify({"error": "Async simulations need REDIS_URL (and the 'redis' package) on the server."}), 503
+    record = _load_task(task_id)
+    if record is None:
+        return jsonify({"error": f"Unknown task '{task_id}'"}), 404
+    return jsonify({"task_id": task_id, **record})
+
+
 if __name__ == '__main__':
-    print("Starting Flask app. Endpoints: /simulate, /get_statevector, /get_probabilities")
-    app.run(host='127.0.0.1', port=5000, debug=True)
\ No newline at end of file
+    # Werkzeug dev server; for real use run gunicorn with gunicorn.conf.py (see README)
+    debug = os.getenv("FLASK_ENV") == "development"
+    print(f"Starting Flask dev server (debug={debug}). Endpoints: /simulate, /get_statevector, /get_probabilities, /tasks/<id>")
+    app.run(host='127.0.0.1', port=5000, debug=debug)
\ No newline at end of file
@@ -0,0 +1,12 @@
+# Production server config, picked up automatically by `gunicorn app:app` run from this directory.
+import os
+
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:5000")
+# gthread: IBM Runtime calls wait on the network and Aer releases the GIL, so threads keep each worker busy
+worker_class = "gthread"
+# One process by default: each worker imports app.py separately, so it gets its own /simulate semaphore, Aer thread
+# pool and statevector cache (up to SV_CACHE_MB each). Several workers would run several CPU-sized sets of Aer jobs at once.
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# IBM Quantum jobs can take a while to come back
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
@@ -0,0 +1,34 @@
+import os
+
+os.environ["IBM_QUANTUM_API_KEY"] = "" # Local Aer only
+
+import numpy as np
+from qiskit.quantum_info import Statevector
+
+import app
+
+SWAP_QASM = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[2];\nx q[0];\nswap q[0],q[1];\n'
+
+
+def test_swap_statevector_matches_quantum_info():
+    # Transpiling above level 0 turns the swap into a final_layout permutation that Aer doesn't apply
+    circuit = app._parse_qasm(SWAP_QASM)
+    expected = Statevector(circuit).data
+    np.testing.assert_allclose(app._run_statevector(circuit.copy(), app.AER_SV), expected, atol=1e-9)
+
+
+def test_swap_probabilities_endpoint():
+    response = app.app.test_client().post('/get_probabilities', json={"qasm": SWAP_QASM})
+    assert response.status_code == 200
+    assert response.get_json()["probabilities"] == {"10": 1.0}
+
+
+def test_zx_cache_keeps_swap_outcome():
+    # The exact distribution cached on the first run is shared by every ZX-equivalent circuit
+    client = app.app.test_client()
+    measured = SWAP_QASM + 'creg c[2];\nmeasure q -> c;\n'
+    three_cx = measured.replace('swap q[0],q[1];', 'cx q[0],q[1];\ncx q[1],q[0];\ncx q[0],q[1];')
+    for qasm in (measured, measured, three_cx):
+        response = client.post('/simulate', json={"qasm": qasm, "shots": 100})
+        assert response.status_code == 200
+        assert response.get_json()["counts"] == {"10": 100}
@@ -0,0 +1,33 @@
+# Worker for async /simulate tasks: pops tasks that app.py queued on Redis, runs them, stores the results.
+# Run one or more next to the server: REDIS_URL=redis://localhost:6379/0 python worker.py
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", os.cpu_count() or 1))
+
+
+def handle_task(message, slots):
+    try:
+        app.run_simulate_task(message["task_id"], message["task"]) # Stores running/done/error itself
+    finally:
+        slots.release()
+
+
+def main():
+    if app.redis_client is None:
+        raise SystemExit("worker.py needs REDIS_URL set and the 'redis' package installed.")
+    print(f"Worker: Waiting for tasks on '{app.TASK_QUEUE_KEY}' (concurrency {WORKER_CONCURRENCY}).")
+    slots = threading.Semaphore(WORKER_CONCURRENCY) # Don't pop more tasks than we can run right now
+    with ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY) as executor:
+        while True:
+            slots.acquire()
+            _, raw_message = app.redis_client.brpop(app.TASK_QUEUE_KEY)
+            executor.submit(handle_task, json.loads(raw_message), slots)
+
+
+if __name__ == '__main__':
+    main()